@@ -54,8 +54,9 @@ from anony.core.youtube import YouTube
 tg = Telegram()
 yt = YouTube()
 
-from anony.helpers import Queue
+from anony.helpers import Queue, thumb
 queue = Queue()
+thumb.http = yt.http
 
 from anony.core.calls import TgCall
 anon = TgCall()
@@ -73,5 +74,7 @@ async def stop() -> None:
     await app.exit()
     await userbot.exit()
     await db.close()
+    await thumb.close()
+    await yt.close()
 
     logger.info("Stopped.\n")
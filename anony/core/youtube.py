@@ -1,18 +1,25 @@
 import os
 import re
+import time
 import asyncio
+from collections import OrderedDict
 from pathlib import Path
-from typing import Union, Optional
+from typing import Any, Union, Optional
 
 from py_yt import Playlist, VideosSearch
 
-from anony import logger
+from anony import app, logger
 from anony.helpers import Track, utils
-from anony.helpers._httpx import HttpxClient
-from config import API_URL
+from anony.helpers._http import HttpClient
+from config import API_URL, DOWNLOADS_DIR
+
+_TG_RE = re.compile(r"t\.me/(?P<chat>[^/]+)/(?P<mid>\d+)/?(?:\?.*)?$")
 
 
 class YouTube:
+    CACHE_SIZE = 2048
+    SEARCH_TTL = 3600
+
     def __init__(self):
         self.base = "https://www.youtube.com/watch?v="
         self.regex = re.compile(
@@ -20,35 +27,78 @@ class YouTube:
             r"(youtube\.com/(watch\?v=|shorts/|playlist\?list=)|youtu\.be/)"
             r"([A-Za-z0-9_-]{11}|PL[A-Za-z0-9_-]+)([&?][^\s]*)?"
         )
+        self.http = HttpClient()
+        self._cache: OrderedDict[tuple, tuple[float, Any]] = OrderedDict()
+        self._hits = self._misses = 0
+
+    async def close(self) -> None:
+        await self.http.close()
+
+    def _cache_get(self, key: tuple) -> Any:
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del self._cache[key]
+            entry = None
+
+        if entry is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+            self._cache.move_to_end(key)
+        logger.debug(
+            "YouTube cache %s: %d hits / %d misses",
+            key[0], self._hits, self._misses,
+        )
+        return None if entry is None else entry[1]
+
+    def _cache_set(self, key: tuple, value: Any, ttl: int) -> None:
+        self._cache[key] = (time.monotonic() + ttl, value)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
 
     def valid(self, url: str) -> bool:
-        return bool(re.match(self.regex, url))
+        if "youtu" not in url:
+            return False
+        return self.regex.match(url) is not None
 
     async def search(self, query: str, m_id: int, video: bool = False) -> Track | None:
-        _search = VideosSearch(query, limit=1, with_live=False)
-        results = await _search.next()
-
-        if results and results["result"]:
+        # Video IDs are case-sensitive; only fold free-text queries
+        key = ("search", query if self.valid(query) else query.lower())
+        data = self._cache_get(key)
+
+        if data is None:
+            _search = VideosSearch(query, limit=1, with_live=False)
+            results = await _search.next()
+            if not (results and results["result"]):
+                return None
             data = results["result"][0]
-            return Track(
-                id=data.get("id"),
-                channel_name=data.get("channel", {}).get("name"),
-                duration=data.get("duration"),
-                duration_sec=utils.to_seconds(data.get("duration")),
-                message_id=m_id,
-                title=data.get("title")[:25],
-                thumbnail=data.get("thumbnails", [{}])[-1].get("url").split("?")[0],
-                url=data.get("link"),
-                view_count=data.get("viewCount", {}).get("short"),
-                video=video,
-            )
-        return None
+            self._cache_set(key, data, self.SEARCH_TTL)
+
+        return Track(
+            id=data.get("id"),
+            channel_name=data.get("channel", {}).get("name"),
+            duration=data.get("duration"),
+            duration_sec=utils.to_seconds(data.get("duration")),
+            message_id=m_id,
+            title=data.get("title")[:25],
+            thumbnail=data.get("thumbnails", [{}])[-1].get("url").split("?")[0],
+            url=data.get("link"),
+            view_count=data.get("viewCount", {}).get("short"),
+            video=video,
+        )
 
     async def playlist(self, limit: int, user: str, url: str, video: bool) -> list[Track | None]:
         tracks = []
         try:
-            plist = await Playlist.get(url)
-            for data in plist["videos"][:limit]:
+            key = ("playlist", url)
+            videos = self._cache_get(key)
+            if videos is None:
+                plist = await Playlist.get(url)
+                videos = plist["videos"]
+                self._cache_set(key, videos, self.SEARCH_TTL)
+
+            for data in videos[:limit]:
                 track = Track(
                     id=data.get("id"),
                     channel_name=data.get("channel", {}).get("name", ""),
@@ -75,12 +125,16 @@ class YouTube:
             logger.error("API_URL not set in config.")
             return None
 
+        # Same name play.py checks before calling us
+        file_path = Path(DOWNLOADS_DIR) / f"{video_id}.{'mp4' if video else 'webm'}"
+        if file_path.exists():
+            return str(file_path)
+
         # Build video URL
         video_url = self.base + video_id
-        client = HttpxClient()
 
         try:
-            response = await client.make_request(
+            response = await self.http.make_request(
                 f"{API_URL}/api/track?url={video_url}&video={str(video).lower()}"
             )
 
@@ -95,7 +149,7 @@ class YouTube:
 
             # Direct file
             if not cdn_url.startswith("https://t.me/"):
-                result = await client.download_file(cdn_url)
+                result = await self.http.download_file(cdn_url, file_path)
                 if result.success:
                     return str(result.file_path)
                 logger.warning("CDN download failed.")
@@ -103,14 +157,14 @@ class YouTube:
 
             # Telegram CDN
             try:
-                from anony import app
-                parts = cdn_url.rstrip("/").split("/")
-                chat_username = parts[-2]
-                message_id = int(parts[-1])
+                match = _TG_RE.search(cdn_url)
+                if not match:
+                    raise ValueError(f"unrecognised link {cdn_url}")
+                chat_username, message_id = match["chat"], int(match["mid"])
 
                 msg = await app.get_messages(chat_id=chat_username, message_ids=message_id)
                 if msg:
-                    return await msg.download()
+                    return await msg.download(file_name=str(file_path))
                 return None
 
             except Exception as e:
@@ -120,6 +174,3 @@ class YouTube:
         except Exception as e:
             logger.warning("API request failed: %s", e)
             return None
-
-        finally:
-            await client.close()
@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Union
+from urllib.parse import unquote, urlparse
+
+import aiofiles
+import aiohttp
+import yarl
+
+from config import DOWNLOADS_DIR, API_URL, API_KEY
+from anony import logger
+
+_FILENAME_RE = re.compile(r'filename="?([^"]+)"?')
+
+
+@dataclass
+class DownloadResult:
+    success: bool
+    file_path: Optional[Path] = None
+    error: Optional[str] = None
+
+
+class HttpClient:
+    DEFAULT_TIMEOUT = 120
+    DEFAULT_DOWNLOAD_TIMEOUT = 300
+    CHUNK_SIZE = 128 * 1024
+    MAX_RETRIES = 2
+    BACKOFF_FACTOR = 1.0
+    MAX_CONNECTIONS = 100
+    MAX_CONNECTIONS_PER_HOST = 50
+    KEEPALIVE_TIMEOUT = 60
+    MAX_COOLDOWN = 30
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._dirs: set[Path] = set()
+        self._cooldowns: dict[str, float] = {}
+        self._pending: dict[Path, asyncio.Future] = {}
+
+    # aiohttp binds the session to the running loop, so it is created lazily
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.MAX_CONNECTIONS,
+                    limit_per_host=self.MAX_CONNECTIONS_PER_HOST,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=self.KEEPALIVE_TIMEOUT,
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=self.DEFAULT_TIMEOUT,
+                    sock_read=self.DEFAULT_TIMEOUT,
+                ),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is None:
+            return
+        try:
+            await self._session.close()
+        except Exception as e:
+            logger.error("Error closing HTTP session: %s", repr(e))
+
+    # 🔐 Auto API key header
+    @staticmethod
+    def _get_headers(url: str, base_headers: dict[str, str]):
+        headers = base_headers.copy()
+
+        if API_URL and API_KEY and url.startswith(API_URL):
+            headers["X-API-Key"] = API_KEY
+
+        headers.setdefault("User-Agent", "AnonXMusicBot/1.0")
+
+        return headers
+
+    @staticmethod
+    def _cache_path(url: str, suffix: str = "") -> Path:
+        name = hashlib.sha1(url.encode()).hexdigest()[:16]
+        return Path(DOWNLOADS_DIR) / f"{name}{suffix}"
+
+    # 📄 Raw response body
+    async def read(self, url: str, **kwargs) -> bytes:
+        headers = self._get_headers(url, kwargs.pop("headers", {}))
+        async with self.session.get(
+            yarl.URL(url, encoded=True), headers=headers, **kwargs
+        ) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    # 🌐 API JSON request
+    async def make_request(self, url: str, **kwargs) -> Optional[dict]:
+        headers = self._get_headers(url, kwargs.pop("headers", {}))
+        host = urlparse(url).netloc
+
+        for attempt in range(self.MAX_RETRIES):
+            # Wait out a cooldown set by any request to the same host
+            delay = self._cooldowns.get(host, 0.0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            try:
+                async with self.session.get(
+                    yarl.URL(url, encoded=True), headers=headers, **kwargs
+                ) as response:
+                    response.raise_for_status()
+                    return await response.json(content_type=None)
+            except Exception as e:
+                logger.warning("API request failed (%s): %s", attempt + 1, e)
+                await self._backoff(host, e, attempt, attempt + 1 < self.MAX_RETRIES)
+
+        logger.error("All retries failed for %s", url)
+        return None
+
+    async def _backoff(self, host: str, error: Exception, attempt: int, retry: bool) -> None:
+        delay = self.BACKOFF_FACTOR * (2 ** attempt)
+
+        if isinstance(error, aiohttp.ClientResponseError):
+            if error.status != 429 and error.status < 500:
+                if retry:
+                    await asyncio.sleep(delay)
+                return
+            retry_after = self._retry_after(error.headers)
+            delay = delay if retry_after is None else retry_after
+        elif not isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+            if retry:
+                await asyncio.sleep(delay)
+            return
+
+        # Rate limited or unreachable host: all callers share one deadline,
+        # recorded even on the last attempt so the next request waits too
+        deadline = time.monotonic() + min(delay, self.MAX_COOLDOWN)
+        self._cooldowns[host] = max(self._cooldowns.get(host, 0.0), deadline)
+
+    @staticmethod
+    def _retry_after(headers: Optional[Any]) -> Optional[float]:
+        for name in ("Retry-After", "X-RateLimit-Reset"):
+            try:
+                delay = float(headers.get(name))
+            except (AttributeError, TypeError, ValueError):
+                continue
+            # X-RateLimit-Reset is usually an epoch timestamp
+            if delay > 1e9:
+                delay -= time.time()
+            return max(delay, 0.0)
+        return None
+
+    # 📥 File download
+    async def download_file(
+        self,
+        url: str,
+        file_path: Optional[Union[str, Path]] = None,
+        overwrite: bool = False,
+        **kwargs,
+    ) -> DownloadResult:
+
+        headers = self._get_headers(url, kwargs.pop("headers", {}))
+
+        if file_path is None:
+            path = self._cache_path(url, Path(urlparse(url).path).suffix)
+        else:
+            path = Path(file_path)
+
+        # Without an extension the final name is only known from the headers
+        resolved = file_path is not None or bool(path.suffix)
+        if resolved and path.exists() and not overwrite:
+            return DownloadResult(True, file_path=path)
+
+        # Callers asking for the same target share one in-flight download
+        pending = self._pending.get(path)
+        if pending is None:
+            pending = asyncio.ensure_future(
+                self._download(url, path, resolved, overwrite, headers)
+            )
+            self._pending[path] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(path, None))
+
+        return await asyncio.shield(pending)
+
+    async def _download(
+        self,
+        url: str,
+        path: Path,
+        resolved: bool,
+        overwrite: bool,
+        headers: dict[str, str],
+    ) -> DownloadResult:
+        part = None
+        try:
+            async with self.session.get(
+                yarl.URL(url, encoded=True),
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=self.DEFAULT_DOWNLOAD_TIMEOUT,
+                    sock_read=self.DEFAULT_DOWNLOAD_TIMEOUT,
+                ),
+                headers=headers,
+            ) as response:
+
+                response.raise_for_status()
+
+                if not resolved:
+                    cd = response.headers.get("Content-Disposition", "")
+                    match = _FILENAME_RE.search(cd)
+                    if match:
+                        path = path.with_suffix(Path(unquote(match.group(1))).suffix)
+
+                    if path.exists() and not overwrite:
+                        return DownloadResult(True, file_path=path)
+
+                if path.parent not in self._dirs:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    self._dirs.add(path.parent)
+
+                # Network reads and disk writes overlap through a bounded queue
+                part = path.with_name(f".{path.name}.{uuid.uuid4().hex}.part")
+                queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue(maxsize=8)
+
+                async with aiofiles.open(part, "wb") as f:
+                    writer = asyncio.create_task(self._write_chunks(f, queue))
+                    try:
+                        async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                            # Writer only exits early on error; stop reading
+                            if writer.done():
+                                break
+                            await self._put(queue, writer, chunk)
+                        else:
+                            await self._put(queue, writer, None)
+                        await writer
+                    finally:
+                        writer.cancel()
+
+                part.replace(path)
+                return DownloadResult(True, file_path=path)
+
+        except Exception as e:
+            if part is not None:
+                part.unlink(missing_ok=True)
+            logger.error("Download failed: %s", e)
+            return DownloadResult(False, error=str(e))
+
+    @staticmethod
+    async def _write_chunks(f, queue: asyncio.Queue) -> None:
+        while (chunk := await queue.get()) is not None:
+            await f.write(chunk)
+
+    @staticmethod
+    async def _put(queue: asyncio.Queue, writer: asyncio.Task, item) -> None:
+        # Race a blocking put against the writer so a dead writer can't stall us
+        if not queue.full():
+            queue.put_nowait(item)
+            return
+        put = asyncio.ensure_future(queue.put(item))
+        await asyncio.wait((put, writer), return_when=asyncio.FIRST_COMPLETED)
+        put.cancel()
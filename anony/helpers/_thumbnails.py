@@ -1,10 +1,15 @@
+import asyncio
+import functools
+import hashlib
 import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-import httpx
+
+import aiohttp
 from PIL import (
     Image,
     ImageDraw,
-    ImageEnhance,
     ImageFilter,
     ImageFont,
     ImageOps,
@@ -12,6 +17,7 @@ from PIL import (
 
 from anony import logger, config
 from anony.helpers import Track
+from anony.helpers._http import HttpClient
 
 
 def load_fonts():
@@ -29,154 +35,215 @@ def load_fonts():
         }
 
 
-FONTS = load_fonts()
-
-
-async def fetch_image(url: str) -> Image.Image:
-    async with httpx.AsyncClient() as client:
-        try:
-            r = await client.get(url, timeout=6)
-            r.raise_for_status()
-            img = Image.open(BytesIO(r.content)).convert("RGBA")
-
-            img = ImageOps.fit(
-                img,
-                (1280, 720),
-                Image.Resampling.LANCZOS
-            )
-
-            return img
-
-        except:
-            return Image.new("RGBA", (1280, 720), (25, 18, 18, 255))
+def load_controls():
+    try:
+        controls = Image.open("anony/assets/controls.png").convert("RGBA")
+        return controls.resize((600, 160), Image.Resampling.LANCZOS)
+    except:
+        return None
 
 
-class Thumbnail:
-    async def generate(self, song: Track) -> str:
-        try:
-            os.makedirs("cache", exist_ok=True)
-            save_path = f"cache/{song.id}_final.png"
+# Masks are shared between renders; callers must not draw on them
+@functools.lru_cache(maxsize=32)
+def rounded_mask(width: int, height: int, radius: int) -> Image.Image:
+    mask = Image.new("L", (width, height), 0)
+    ImageDraw.Draw(mask).rounded_rectangle(
+        (0, 0, width, height),
+        radius=radius,
+        fill=255,
+    )
+    return mask
 
-            thumb = await fetch_image(song.thumbnail)
 
-            width, height = 1280, 720
+FONTS = load_fonts()
+CONTROLS = load_controls()
 
-            # ===== BACKGROUND =====
-            bg = thumb.copy()
-            bg = bg.filter(ImageFilter.GaussianBlur(18))
-            bg = ImageEnhance.Brightness(bg).enhance(0.60)
+# PIL work runs here, sized to the CPU count and kept off the default
+# executor that aiofiles and asyncio.to_thread share
+_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="thumb")
 
-            # ===== PANEL FRAME =====
-            panel_margin_x = 260
-            panel_margin_y = 100
 
-            panel_x = panel_margin_x
-            panel_y = panel_margin_y
+def _darken(img: Image.Image, factor: float) -> Image.Image:
+    # Same result as ImageEnhance.Brightness, in one lookup pass
+    lut = [round(i * factor) for i in range(256)]
+    return img.point(lut * 3 + list(range(256)) * (len(img.getbands()) - 3))
 
-            panel_w = width - (panel_margin_x * 2)
-            panel_h = height - (panel_margin_y * 2)
 
-            # ===== NATURAL GLASS EFFECT =====
-            panel_area = bg.crop(
-                (panel_x, panel_y, panel_x + panel_w, panel_y + panel_h)
-            )
+def _soft_blur(img: Image.Image, radius: float, scale: int = 4) -> Image.Image:
+    # A wide blur hides the detail lost by blurring at 1/scale and upsampling
+    small = img.reduce(scale).filter(ImageFilter.GaussianBlur(radius / scale))
+    return small.resize(img.size, Image.Resampling.BILINEAR)
 
-            panel_area = panel_area.filter(ImageFilter.GaussianBlur(10))
-            panel_area = ImageEnhance.Brightness(panel_area).enhance(0.5)
 
-            mask = Image.new("L", (panel_w, panel_h), 0)
-            ImageDraw.Draw(mask).rounded_rectangle(
-                (0, 0, panel_w, panel_h),
-                radius=35,
-                fill=255,
-            )
+def _decode(data: bytes) -> Image.Image:
+    img = Image.open(BytesIO(data)).convert("RGB")
 
-            bg.paste(panel_area, (panel_x, panel_y), mask)
+    return ImageOps.fit(
+        img,
+        (1280, 720),
+        Image.Resampling.LANCZOS
+    )
 
-            draw = ImageDraw.Draw(bg)
 
-            # ===== COVER =====
-            cover = ImageOps.fit(
-                thumb,
-                (184, 184),
-                Image.Resampling.LANCZOS
-            )
-
-            cover_mask = Image.new("L", (184, 184), 0)
-            ImageDraw.Draw(cover_mask).rounded_rectangle(
-                (0, 0, 184, 184),
-                radius=25,
-                fill=255
-            )
+async def fetch_image(http: HttpClient, url: str) -> Image.Image | None:
+    try:
+        data = await http.read(url, timeout=aiohttp.ClientTimeout(total=6))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_POOL, _decode, data)
 
-            cover.putalpha(cover_mask)
-            bg.paste(cover, (325, 155), cover)
+    except:
+        return None
 
-            # ===== SMALL LABEL ABOVE TITLE =====
-            draw.text(
-                (520, 170),
-                "Nancy Music",
-                fill=(200, 200, 200),
-                font=FONTS["small"],
-            )
 
-            # ===== TEXT =====
-            title = (song.title or "Unknown Title")[:45]
-            artist = (song.channel_name or "Unknown Artist")[:40]
+class Thumbnail:
+    def __init__(self):
+        # Shared client, attached by anony once YouTube is created
+        self.http: HttpClient | None = None
+        # save_path -> [lock, number of callers holding or waiting on it]
+        self._locks: dict[str, list] = {}
+
+    async def close(self) -> None:
+        _POOL.shutdown(wait=False)
+
+    @staticmethod
+    def _cache_path(song: Track) -> str:
+        # Hash whatever is drawn so metadata changes invalidate the file
+        key = "\0".join(
+            str(v) for v in (song.thumbnail, song.title, song.channel_name, song.duration)
+        )
+        digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+        return f"cache/{song.id}_{digest}.jpg"
 
-            draw.text(
-                (520, 205),
-                title,
-                fill="white",
-                font=FONTS["title"],
-            )
+    async def generate(self, song: Track) -> str:
+        save_path = self._cache_path(song)
+        if os.path.exists(save_path):
+            return save_path
 
-            draw.text(
-                (520, 260),
-                artist,
-                fill=(210, 210, 210),
-                font=FONTS["artist"],
-            )
+        entry = self._locks.setdefault(save_path, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                # another request may have rendered it while we waited
+                if os.path.exists(save_path):
+                    return save_path
 
-            # ===== CONTROLS =====
-            try:
-                controls = Image.open("anony/assets/controls.png").convert("RGBA")
-                controls = controls.resize((600, 160), Image.Resampling.LANCZOS)
-
-                bg.paste(
-                    controls,
-                    (335, 415),
-                    controls,
-                )
-            except:
-                pass
-
-            # ===== REMOVE DASH FROM CONTROLS =====
-            erase_x = 880
-            erase_y = 430
-            erase_w = 50
-            erase_h = 25
-
-            patch = bg.crop((erase_x, erase_y, erase_x + erase_w, erase_y + erase_h))
-            patch = patch.filter(ImageFilter.GaussianBlur(30))
-            bg.paste(patch, (erase_x, erase_y))
-
-            # ===== END TIME (RIGHT SIDE ONLY) =====
-            total_time = getattr(song, "duration", "3:25")
-
-            time_y = 427
-            text_width = draw.textlength(total_time, font=FONTS["small"])
-
-            draw.text(
-                (panel_x + panel_w - 100 - text_width, time_y),
-                total_time,
-                fill=(220, 220, 220),
-                font=FONTS["small"],
-            )
+                out_path = save_path
+                thumb = await fetch_image(self.http, song.thumbnail)
+                if thumb is None:
+                    # the fetch may just be flaky; don't cache the placeholder
+                    thumb = Image.new("RGB", (1280, 720), (25, 18, 18))
+                    out_path = f"cache/{song.id}_fallback.jpg"
 
-            bg.save(save_path, "PNG", quality=95)
-            return save_path
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(_POOL, self._render, song, thumb, out_path)
 
         except Exception as e:
             logger.warning("Thumbnail generation failed: %s", e)
             return config.DEFAULT_THUMB
+
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[save_path]
+
+    def _render(self, song: Track, thumb: Image.Image, save_path: str) -> str:
+        width, height = 1280, 720
+
+        # ===== BACKGROUND =====
+        bg = _soft_blur(thumb, 18)
+        bg = _darken(bg, 0.60)
+
+        # ===== PANEL FRAME =====
+        panel_margin_x = 260
+        panel_margin_y = 100
+
+        panel_x = panel_margin_x
+        panel_y = panel_margin_y
+
+        panel_w = width - (panel_margin_x * 2)
+        panel_h = height - (panel_margin_y * 2)
+
+        # ===== NATURAL GLASS EFFECT =====
+        panel_area = bg.crop(
+            (panel_x, panel_y, panel_x + panel_w, panel_y + panel_h)
+        )
+
+        panel_area = _soft_blur(panel_area, 10)
+        panel_area = _darken(panel_area, 0.5)
+
+        bg.paste(panel_area, (panel_x, panel_y), rounded_mask(panel_w, panel_h, 35))
+
+        draw = ImageDraw.Draw(bg)
+
+        # ===== COVER =====
+        cover = ImageOps.fit(
+            thumb,
+            (184, 184),
+            Image.Resampling.BILINEAR
+        )
+
+        cover.putalpha(rounded_mask(184, 184, 25))
+        bg.paste(cover, (325, 155), cover)
+
+        # ===== SMALL LABEL ABOVE TITLE =====
+        draw.text(
+            (520, 170),
+            "Nancy Music",
+            fill=(200, 200, 200),
+            font=FONTS["small"],
+        )
+
+        # ===== TEXT =====
+        title = (song.title or "Unknown Title")[:45]
+        artist = (song.channel_name or "Unknown Artist")[:40]
+
+        draw.text(
+            (520, 205),
+            title,
+            fill="white",
+            font=FONTS["title"],
+        )
+
+        draw.text(
+            (520, 260),
+            artist,
+            fill=(210, 210, 210),
+            font=FONTS["artist"],
+        )
+
+        # ===== CONTROLS =====
+        if CONTROLS is not None:
+            bg.paste(
+                CONTROLS,
+                (335, 415),
+                CONTROLS,
+            )
+
+        # ===== REMOVE DASH FROM CONTROLS =====
+        erase_x = 880
+        erase_y = 430
+        erase_w = 50
+        erase_h = 25
+
+        patch = bg.crop((erase_x, erase_y, erase_x + erase_w, erase_y + erase_h))
+        patch = patch.filter(ImageFilter.GaussianBlur(30))
+        bg.paste(patch, (erase_x, erase_y))
+
+        # ===== END TIME (RIGHT SIDE ONLY) =====
+        total_time = getattr(song, "duration", "3:25")
+
+        time_y = 427
+        text_width = draw.textlength(total_time, font=FONTS["small"])
+
+        draw.text(
+            (panel_x + panel_w - 100 - text_width, time_y),
+            total_time,
+            fill=(220, 220, 220),
+            font=FONTS["small"],
+        )
+
+        # write then rename so the exists() check never sees a partial file
+        tmp_path = f"{save_path}.{uuid.uuid4().hex}.tmp"
+        bg.save(tmp_path, "JPEG", quality=88)
+        os.replace(tmp_path, save_path)
+        return save_path